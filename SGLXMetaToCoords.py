@@ -22,12 +22,11 @@ The output is set by the outType parameter:
 """
 
 import numpy as np
-import scipy.io
-import matplotlib.pyplot as plt
 from pathlib import Path
-from tkinter import Tk
-from tkinter import filedialog
 import shutil
+import os
+import functools
+import collections
 
 # =========================================================
 # Parse ini file returning a dictionary whose keys are the metadata
@@ -39,21 +38,30 @@ import shutil
 # fucntions. Note that python 3 has no size limit for integers.
 #
 def readMeta(metaPath):
-    metaDict = {}
-    if metaPath.exists():
-        # print("meta file present")
-        with metaPath.open() as f:
-            mdatList = f.read().splitlines()
-            # convert the list entries into key value pairs
-            for m in mdatList:
-                csList = m.split(sep='=')
-                if csList[0][0] == '~':
-                    currKey = csList[0][1:len(csList[0])]
-                else:
-                    currKey = csList[0]
-                metaDict.update({currKey: csList[1]})
-    else:
+    try:
+        mtime = metaPath.stat().st_mtime_ns
+    except FileNotFoundError:
         print("no meta file")
+        return {}
+
+    # parsed dict is cached by path and modification time; return a copy
+    # so callers can't alter the cached entry
+    return dict(_readMetaCached(str(metaPath), mtime))
+
+
+@functools.lru_cache(maxsize=64)
+def _readMetaCached(metaPathStr, mtime):
+    with open(metaPathStr) as f:
+        mdatList = f.read().splitlines()
+
+    # convert the list entries into key value pairs
+    def keyValue(m):
+        currKey, _, currValue = m.partition('=')
+        if currKey[:1] == '~':
+            currKey = currKey[1:]
+        return currKey, currValue
+
+    metaDict = dict(keyValue(m) for m in mdatList if m)
         
     return(metaDict)
     
@@ -72,90 +80,164 @@ def ChannelCountsIM(meta):
 
 
 # =========================================================
-# Return geometry paramters for supported probe types
-# These are used to calculate positions from metadata
-# that includes only ~snsShankMap
+# Geometry parameters for supported probe types, keyed by part number.
+# These are used to calculate positions from metadata that includes
+# only ~snsShankMap. Built once at import.
 #
-def getGeomParams(meta):
 # many part numbers have the same geometry parameters ;
-# define those sets in lists
-# [nShank, shankWidth, shankPitch, even_xOff, odd_xOff, horizPitch, vertPitch, rowsPerShank, elecPerShank]
+# define those sets as GeomParams
 # offset and pitch values in um
-    np1_stag_70um       = [1,  70,   0,   27,   11,  32,  20,  480,  960]
-    nhp_lin_70um        = [1,  70,   0,   27,   27,  32,  20,  480,  960]
-    nhp_stag_125um_med  = [1, 125,   0,   27,   11,  87,  20, 1368, 2496]
-    nhp_stag_125um_long = [1, 125,   0,   27,   11,  87,  20, 2208, 4416]
-    nhp_lin_125um_med   = [1, 125,   0,   11,   11, 103,  20, 1368, 2496]
-    nhp_lin_125um_long  = [1, 125,   0,   11,   11, 103,  20, 2208, 4416]
-    uhd_8col_1bank      = [1,  70,   0,   14,   14,   6,   6,   48,  384]
-    uhd_8col_16bank     = [1,  70,   0,   14,   14,   6,   6,  768, 6144]
-    np2_ss              = [1,  70,   0,   27,   27,  32,  15,  640, 1280]
-    np2_4s              = [4,  70, 250,   27,   27,  32,  15,  640, 1280]
-    NP1120              = [1,  70,   0, 6.75, 6.75, 4.5, 4.5,  192,  384]
-    NP1121              = [1,  70,   0, 6.25, 6.25,   3,   3,  384,  384]
-    NP1122              = [1,  70,   0, 6.75, 6.75, 4.5, 4.5,   24,  384]
-    NP1123              = [1,  70,   0,10.25,10.25,   3,   3,   32,  384]
-    NP1300              = [1,  70,   0,   11,   11,  48,  20,  480,  960]
-    NP1200              = [1,  70,   0,   27,   11,  32,  20,   64,  128]
-    NXT3000             = [1,  70,   0,   53,   53,   0,  15,  128,  128]
-    
-    M = dict([
-    ('3A',np1_stag_70um),
-    ('PRB_1_4_0480_1',np1_stag_70um),
-    ('PRB_1_4_0480_1_C',np1_stag_70um),
-    ('NP1010',np1_stag_70um), 
-    ('NP1011',np1_stag_70um),
-    ('NP1012',np1_stag_70um),
-    ('NP1013',np1_stag_70um),
-    
-    ('NP1015',nhp_lin_70um),
-    ('NP1015',nhp_lin_70um),
-    ('NP1016',nhp_lin_70um),
-    ('NP1017',nhp_lin_70um),
-       
-    ('NP1020',nhp_stag_125um_med),
-    ('NP1021',nhp_stag_125um_med),
-    ('NP1030',nhp_stag_125um_long),
-    ('NP1031',nhp_stag_125um_long),
-    
-    ('NP1022',nhp_lin_125um_med),
-    ('NP1032',nhp_lin_125um_long),
-    
-    ('NP1100',uhd_8col_1bank),
-    ('NP1110',uhd_8col_16bank),
-    
-    ('PRB2_1_4_0480_1',np2_ss),
-    ('PRB2_1_2_0640_0',np2_ss),
-    ('NP2000',np2_ss),
-    ('NP2003',np2_ss),
-    ('NP2004',np2_ss),
-    
-    ('PRB2_4_2_0640_0',np2_4s),
-    ('PRB2_4_4_0480_1',np2_4s),
-    ('NP2010',np2_4s),
-    ('NP2013',np2_4s),
-    ('NP2014',np2_4s),
-    
-    ('NP1120',NP1120),
-    ('NP1121',NP1121),
-    ('NP1122',NP1122),
-    ('NP1123',NP1123),
-    ('NP1300',NP1300),
-    
-    ('NP1200',NP1200),
-    ('NXT3000',NXT3000)
-    ])
-    
-    # get probe part number; if absent, this is a 3A
-    if 'imDatPrb_pn' in meta:   
-        pn = meta['imDatPrb_pn']
-    else:
-        pn = '3A';
+GeomParams = collections.namedtuple('GeomParams',
+    ['nShank', 'shankWidth', 'shankPitch', 'even_xOff', 'odd_xOff',
+     'horizPitch', 'vertPitch', 'rowsPerShank', 'elecPerShank'])
+
+_np1_stag_70um       = GeomParams(1,  70,   0,   27,   11,  32,  20,  480,  960)
+_nhp_lin_70um        = GeomParams(1,  70,   0,   27,   27,  32,  20,  480,  960)
+_nhp_stag_125um_med  = GeomParams(1, 125,   0,   27,   11,  87,  20, 1368, 2496)
+_nhp_stag_125um_long = GeomParams(1, 125,   0,   27,   11,  87,  20, 2208, 4416)
+_nhp_lin_125um_med   = GeomParams(1, 125,   0,   11,   11, 103,  20, 1368, 2496)
+_nhp_lin_125um_long  = GeomParams(1, 125,   0,   11,   11, 103,  20, 2208, 4416)
+_uhd_8col_1bank      = GeomParams(1,  70,   0,   14,   14,   6,   6,   48,  384)
+_uhd_8col_16bank     = GeomParams(1,  70,   0,   14,   14,   6,   6,  768, 6144)
+_np2_ss              = GeomParams(1,  70,   0,   27,   27,  32,  15,  640, 1280)
+_np2_4s              = GeomParams(4,  70, 250,   27,   27,  32,  15,  640, 1280)
+_NP1120              = GeomParams(1,  70,   0, 6.75, 6.75, 4.5, 4.5,  192,  384)
+_NP1121              = GeomParams(1,  70,   0, 6.25, 6.25,   3,   3,  384,  384)
+_NP1122              = GeomParams(1,  70,   0, 6.75, 6.75, 4.5, 4.5,   24,  384)
+_NP1123              = GeomParams(1,  70,   0,10.25,10.25,   3,   3,   32,  384)
+_NP1300              = GeomParams(1,  70,   0,   11,   11,  48,  20,  480,  960)
+_NP1200              = GeomParams(1,  70,   0,   27,   11,  32,  20,   64,  128)
+_NXT3000             = GeomParams(1,  70,   0,   53,   53,   0,  15,  128,  128)
+
+_GEOM_PARAMS = dict([
+    ('3A',_np1_stag_70um),
+    ('PRB_1_4_0480_1',_np1_stag_70um),
+    ('PRB_1_4_0480_1_C',_np1_stag_70um),
+    ('NP1010',_np1_stag_70um),
+    ('NP1011',_np1_stag_70um),
+    ('NP1012',_np1_stag_70um),
+    ('NP1013',_np1_stag_70um),
+
+    ('NP1015',_nhp_lin_70um),
+    ('NP1015',_nhp_lin_70um),
+    ('NP1016',_nhp_lin_70um),
+    ('NP1017',_nhp_lin_70um),
+
+    ('NP1020',_nhp_stag_125um_med),
+    ('NP1021',_nhp_stag_125um_med),
+    ('NP1030',_nhp_stag_125um_long),
+    ('NP1031',_nhp_stag_125um_long),
+
+    ('NP1022',_nhp_lin_125um_med),
+    ('NP1032',_nhp_lin_125um_long),
+
+    ('NP1100',_uhd_8col_1bank),
+    ('NP1110',_uhd_8col_16bank),
+
+    ('PRB2_1_4_0480_1',_np2_ss),
+    ('PRB2_1_2_0640_0',_np2_ss),
+    ('NP2000',_np2_ss),
+    ('NP2003',_np2_ss),
+    ('NP2004',_np2_ss),
+
+    ('PRB2_4_2_0640_0',_np2_4s),
+    ('PRB2_4_4_0480_1',_np2_4s),
+    ('NP2010',_np2_4s),
+    ('NP2013',_np2_4s),
+    ('NP2014',_np2_4s),
+
+    ('NP1120',_NP1120),
+    ('NP1121',_NP1121),
+    ('NP1122',_NP1122),
+    ('NP1123',_NP1123),
+    ('NP1300',_NP1300),
+
+    ('NP1200',_NP1200),
+    ('NXT3000',_NXT3000)
+])
 
 
-    if pn in M:
-        geomList = M[pn]
-    else:
+# =========================================================
+# Full MUX table strings to append to metadata, keyed by part number.
+# As of 032923, there are 4 mux tables
+#
+_np1_mux = r'~muxTbl=(32,12)(0 1 24 25 48 49 72 73 96 97 120 121 144 145 168 169 192 193 216 217 240 241 264 265 288 289 312 313 336 337 360 361)(2 3 26 27 50 51 74 75 98 99 122 123 146 147 170 171 194 195 218 219 242 243 266 267 290 291 314 315 338 339 362 363)(4 5 28 29 52 53 76 77 100 101 124 125 148 149 172 173 196 197 220 221 244 245 268 269 292 293 316 317 340 341 364 365)(6 7 30 31 54 55 78 79 102 103 126 127 150 151 174 175 198 199 222 223 246 247 270 271 294 295 318 319 342 343 366 367)(8 9 32 33 56 57 80 81 104 105 128 129 152 153 176 177 200 201 224 225 248 249 272 273 296 297 320 321 344 345 368 369)(10 11 34 35 58 59 82 83 106 107 130 131 154 155 178 179 202 203 226 227 250 251 274 275 298 299 322 323 346 347 370 371)(12 13 36 37 60 61 84 85 108 109 132 133 156 157 180 181 204 205 228 229 252 253 276 277 300 301 324 325 348 349 372 373)(14 15 38 39 62 63 86 87 110 111 134 135 158 159 182 183 206 207 230 231 254 255 278 279 302 303 326 327 350 351 374 375)(16 17 40 41 64 65 88 89 112 113 136 137 160 161 184 185 208 209 232 233 256 257 280 281 304 305 328 329 352 353 376 377)(18 19 42 43 66 67 90 91 114 115 138 139 162 163 186 187 210 211 234 235 258 259 282 283 306 307 330 331 354 355 378 379)(20 21 44 45 68 69 92 93 116 117 140 141 164 165 188 189 212 213 236 237 260 261 284 285 308 309 332 333 356 357 380 381)(22 23 46 47 70 71 94 95 118 119 142 143 166 167 190 191 214 215 238 239 262 263 286 287 310 311 334 335 358 359 382 383)' + '\n'
+_np2_mux = r'~muxTbl=(24,16)(0 1 32 33 64 65 96 97 128 129 160 161 192 193 224 225 256 257 288 289 320 321 352 353)(2 3 34 35 66 67 98 99 130 131 162 163 194 195 226 227 258 259 290 291 322 323 354 355)(4 5 36 37 68 69 100 101 132 133 164 165 196 197 228 229 260 261 292 293 324 325 356 357)(6 7 38 39 70 71 102 103 134 135 166 167 198 199 230 231 262 263 294 295 326 327 358 359)(8 9 40 41 72 73 104 105 136 137 168 169 200 201 232 233 264 265 296 297 328 329 360 361)(10 11 42 43 74 75 106 107 138 139 170 171 202 203 234 235 266 267 298 299 330 331 362 363)(12 13 44 45 76 77 108 109 140 141 172 173 204 205 236 237 268 269 300 301 332 333 364 365)(14 15 46 47 78 79 110 111 142 143 174 175 206 207 238 239 270 271 302 303 334 335 366 367)(16 17 48 49 80 81 112 113 144 145 176 177 208 209 240 241 272 273 304 305 336 337 368 369)(18 19 50 51 82 83 114 115 146 147 178 179 210 211 242 243 274 275 306 307 338 339 370 371)(20 21 52 53 84 85 116 117 148 149 180 181 212 213 244 245 276 277 308 309 340 341 372 373)(22 23 54 55 86 87 118 119 150 151 182 183 214 215 246 247 278 279 310 311 342 343 374 375)(24 25 56 57 88 89 120 121 152 153 184 185 216 217 248 249 280 281 312 313 344 345 376 377)(26 27 58 59 90 91 122 123 154 155 186 187 218 219 250 251 282 283 314 315 346 347 378 379)(28 29 60 61 92 93 124 125 156 157 188 189 220 221 252 253 284 285 316 317 348 349 380 381)(30 31 62 63 94 95 126 127 158 159 190 191 222 223 254 255 286 287 318 319 350 351 382 383)' + '\n'
+_np1100_mux = r'~muxTbl=(32,12)(0 1 24 25 48 49 72 73 96 97 120 121 144 145 168 169 192 193 216 217 240 241 264 265 288 289 312 313 336 337 360 361)(2 3 26 27 50 51 74 75 98 99 122 123 146 147 170 171 194 195 218 219 242 243 266 267 290 291 314 315 338 339 362 363)(4 5 28 29 52 53 76 77 100 101 124 125 148 149 172 173 196 197 220 221 244 245 268 269 292 293 316 317 340 341 364 365)(6 7 30 31 54 55 78 79 102 103 126 127 150 151 174 175 198 199 222 223 246 247 270 271 294 295 318 319 342 343 366 367)(8 9 32 33 56 57 80 81 104 105 128 129 152 153 176 177 200 201 224 225 248 249 272 273 296 297 320 321 344 345 368 369)(10 11 34 35 58 59 82 83 106 107 130 131 154 155 178 179 202 203 226 227 250 251 274 275 298 299 322 323 346 347 370 371)(12 13 36 37 60 61 84 85 108 109 132 133 156 157 180 181 204 205 228 229 252 253 276 277 300 301 324 325 348 349 372 373)(14 15 38 39 62 63 86 87 110 111 134 135 158 159 182 183 206 207 230 231 254 255 278 279 302 303 326 327 350 351 374 375)(16 17 40 41 64 65 88 89 112 113 136 137 160 161 184 185 208 209 232 233 256 257 280 281 304 305 328 329 352 353 376 377)(18 19 42 43 66 67 90 91 114 115 138 139 162 163 186 187 210 211 234 235 258 259 282 283 306 307 330 331 354 355 378 379)(20 21 44 45 68 69 92 93 116 117 140 141 164 165 188 189 212 213 236 237 260 261 284 285 308 309 332 333 356 357 380 381)(22 23 46 47 70 71 94 95 118 119 142 143 166 167 190 191 214 215 238 239 262 263 286 287 310 311 334 335 358 359 382 383)' + '\n'
+_np128ch_mux = r'~muxTbl=(12,12)(84 11 85 5 74 10 56 112 46 121 39 127)(100 26 110 33 69 24 63 109 45 93 25 99)(87 0 82 6 71 15 53 117 43 122 42 116)(102 28 81 34 70 18 60 103 17 94 27 101)(73 1 86 7 68 16 50 106 40 123 128 128)(105 29 75 35 67 12 54 89 20 95 128 128)(76 2 83 8 65 13 47 118 49 124 128 128)(108 30 78 36 64 14 51 90 23 96 128 128)(79 3 80 9 62 114 44 119 52 125 128 128)(104 31 72 37 61 113 57 91 19 97 128 128)(88 4 77 21 59 111 41 120 55 126 128 128)(107 32 66 38 58 115 48 92 22 98 128 128)' + '\n'
+
+_MUX_TABLES = dict([
+    ('3A',_np1_mux),
+    ('PRB_1_4_0480_1',_np1_mux),
+    ('PRB_1_4_0480_1_C',_np1_mux),
+    ('NP1010',_np1_mux),
+    ('NP1011',_np1_mux),
+    ('NP1012',_np1_mux),
+    ('NP1013',_np1_mux),
+
+    ('NP1015',_np1_mux),
+    ('NP1015',_np1_mux),
+    ('NP1016',_np1_mux),
+    ('NP1017',_np1_mux),
+
+    ('NP1020',_np1_mux),
+    ('NP1021',_np1_mux),
+    ('NP1030',_np1_mux),
+    ('NP1031',_np1_mux),
+
+    ('NP1022',_np1_mux),
+    ('NP1032',_np1_mux),
+
+    ('NP1100',_np1_mux),
+    ('NP1110',_np1100_mux),
+
+    ('PRB2_1_4_0480_1',_np2_mux),
+    ('PRB2_1_2_0640_0',_np2_mux),
+    ('NP2000',_np2_mux),
+    ('NP2003',_np2_mux),
+    ('NP2004',_np2_mux),
+
+    ('PRB2_4_2_0640_0',_np2_mux),
+    ('PRB2_4_4_0480_1',_np2_mux),
+    ('NP2010',_np2_mux),
+    ('NP2013',_np2_mux),
+    ('NP2014',_np2_mux),
+
+    ('NP1120',_np1_mux),
+    ('NP1121',_np1_mux),
+    ('NP1122',_np1_mux),
+    ('NP1123',_np1_mux),
+    ('NP1300',_np1_mux),
+
+    ('NP1200',_np128ch_mux),
+    ('NXT3000',_np128ch_mux)
+])
+
+
+# =========================================================
+# Return the probe part number from meta; if absent, this is a 3A
+#
+def _resolvePn(meta):
+    return meta.get('imDatPrb_pn', '3A')
+
+
+# =========================================================
+# Return (geomParams, muxTable) for a probe part number, 
+# or (None, None) if the part number is not supported
+#
+def _tablesFor(pn):
+    return _GEOM_PARAMS.get(pn), _MUX_TABLES.get(pn)
+
+
+# =========================================================
+# Return geometry paramters for supported probe types as a GeomParams
+# These are used to calculate positions from metadata
+# that includes only ~snsShankMap
+#
+def getGeomParams(meta):
+
+    geomList, _ = _tablesFor(_resolvePn(meta))
+    if geomList is None:
         print('unsupported probe part number\n')
         geomList = []
     
@@ -166,76 +248,13 @@ def getGeomParams(meta):
 # Return full MUX table string to append to metadata
 #
 def getMuxTable(meta):
-# Read probe part number from meta
-# Return full MUX table string to append to metadata
-# As of 032923, there are 4 mux tables
 
-    np1=r'~muxTbl=(32,12)(0 1 24 25 48 49 72 73 96 97 120 121 144 145 168 169 192 193 216 217 240 241 264 265 288 289 312 313 336 337 360 361)(2 3 26 27 50 51 74 75 98 99 122 123 146 147 170 171 194 195 218 219 242 243 266 267 290 291 314 315 338 339 362 363)(4 5 28 29 52 53 76 77 100 101 124 125 148 149 172 173 196 197 220 221 244 245 268 269 292 293 316 317 340 341 364 365)(6 7 30 31 54 55 78 79 102 103 126 127 150 151 174 175 198 199 222 223 246 247 270 271 294 295 318 319 342 343 366 367)(8 9 32 33 56 57 80 81 104 105 128 129 152 153 176 177 200 201 224 225 248 249 272 273 296 297 320 321 344 345 368 369)(10 11 34 35 58 59 82 83 106 107 130 131 154 155 178 179 202 203 226 227 250 251 274 275 298 299 322 323 346 347 370 371)(12 13 36 37 60 61 84 85 108 109 132 133 156 157 180 181 204 205 228 229 252 253 276 277 300 301 324 325 348 349 372 373)(14 15 38 39 62 63 86 87 110 111 134 135 158 159 182 183 206 207 230 231 254 255 278 279 302 303 326 327 350 351 374 375)(16 17 40 41 64 65 88 89 112 113 136 137 160 161 184 185 208 209 232 233 256 257 280 281 304 305 328 329 352 353 376 377)(18 19 42 43 66 67 90 91 114 115 138 139 162 163 186 187 210 211 234 235 258 259 282 283 306 307 330 331 354 355 378 379)(20 21 44 45 68 69 92 93 116 117 140 141 164 165 188 189 212 213 236 237 260 261 284 285 308 309 332 333 356 357 380 381)(22 23 46 47 70 71 94 95 118 119 142 143 166 167 190 191 214 215 238 239 262 263 286 287 310 311 334 335 358 359 382 383)'
-    np2=r'~muxTbl=(24,16)(0 1 32 33 64 65 96 97 128 129 160 161 192 193 224 225 256 257 288 289 320 321 352 353)(2 3 34 35 66 67 98 99 130 131 162 163 194 195 226 227 258 259 290 291 322 323 354 355)(4 5 36 37 68 69 100 101 132 133 164 165 196 197 228 229 260 261 292 293 324 325 356 357)(6 7 38 39 70 71 102 103 134 135 166 167 198 199 230 231 262 263 294 295 326 327 358 359)(8 9 40 41 72 73 104 105 136 137 168 169 200 201 232 233 264 265 296 297 328 329 360 361)(10 11 42 43 74 75 106 107 138 139 170 171 202 203 234 235 266 267 298 299 330 331 362 363)(12 13 44 45 76 77 108 109 140 141 172 173 204 205 236 237 268 269 300 301 332 333 364 365)(14 15 46 47 78 79 110 111 142 143 174 175 206 207 238 239 270 271 302 303 334 335 366 367)(16 17 48 49 80 81 112 113 144 145 176 177 208 209 240 241 272 273 304 305 336 337 368 369)(18 19 50 51 82 83 114 115 146 147 178 179 210 211 242 243 274 275 306 307 338 339 370 371)(20 21 52 53 84 85 116 117 148 149 180 181 212 213 244 245 276 277 308 309 340 341 372 373)(22 23 54 55 86 87 118 119 150 151 182 183 214 215 246 247 278 279 310 311 342 343 374 375)(24 25 56 57 88 89 120 121 152 153 184 185 216 217 248 249 280 281 312 313 344 345 376 377)(26 27 58 59 90 91 122 123 154 155 186 187 218 219 250 251 282 283 314 315 346 347 378 379)(28 29 60 61 92 93 124 125 156 157 188 189 220 221 252 253 284 285 316 317 348 349 380 381)(30 31 62 63 94 95 126 127 158 159 190 191 222 223 254 255 286 287 318 319 350 351 382 383)'
-    np1100=r'~muxTbl=(32,12)(0 1 24 25 48 49 72 73 96 97 120 121 144 145 168 169 192 193 216 217 240 241 264 265 288 289 312 313 336 337 360 361)(2 3 26 27 50 51 74 75 98 99 122 123 146 147 170 171 194 195 218 219 242 243 266 267 290 291 314 315 338 339 362 363)(4 5 28 29 52 53 76 77 100 101 124 125 148 149 172 173 196 197 220 221 244 245 268 269 292 293 316 317 340 341 364 365)(6 7 30 31 54 55 78 79 102 103 126 127 150 151 174 175 198 199 222 223 246 247 270 271 294 295 318 319 342 343 366 367)(8 9 32 33 56 57 80 81 104 105 128 129 152 153 176 177 200 201 224 225 248 249 272 273 296 297 320 321 344 345 368 369)(10 11 34 35 58 59 82 83 106 107 130 131 154 155 178 179 202 203 226 227 250 251 274 275 298 299 322 323 346 347 370 371)(12 13 36 37 60 61 84 85 108 109 132 133 156 157 180 181 204 205 228 229 252 253 276 277 300 301 324 325 348 349 372 373)(14 15 38 39 62 63 86 87 110 111 134 135 158 159 182 183 206 207 230 231 254 255 278 279 302 303 326 327 350 351 374 375)(16 17 40 41 64 65 88 89 112 113 136 137 160 161 184 185 208 209 232 233 256 257 280 281 304 305 328 329 352 353 376 377)(18 19 42 43 66 67 90 91 114 115 138 139 162 163 186 187 210 211 234 235 258 259 282 283 306 307 330 331 354 355 378 379)(20 21 44 45 68 69 92 93 116 117 140 141 164 165 188 189 212 213 236 237 260 261 284 285 308 309 332 333 356 357 380 381)(22 23 46 47 70 71 94 95 118 119 142 143 166 167 190 191 214 215 238 239 262 263 286 287 310 311 334 335 358 359 382 383)'
-    np128ch=r'~muxTbl=(12,12)(84 11 85 5 74 10 56 112 46 121 39 127)(100 26 110 33 69 24 63 109 45 93 25 99)(87 0 82 6 71 15 53 117 43 122 42 116)(102 28 81 34 70 18 60 103 17 94 27 101)(73 1 86 7 68 16 50 106 40 123 128 128)(105 29 75 35 67 12 54 89 20 95 128 128)(76 2 83 8 65 13 47 118 49 124 128 128)(108 30 78 36 64 14 51 90 23 96 128 128)(79 3 80 9 62 114 44 119 52 125 128 128)(104 31 72 37 61 113 57 91 19 97 128 128)(88 4 77 21 59 111 41 120 55 126 128 128)(107 32 66 38 58 115 48 92 22 98 128 128)'
-       
-    M = dict([
-    ('3A',np1),
-    ('PRB_1_4_0480_1',np1),
-    ('PRB_1_4_0480_1_C',np1),
-    ('NP1010',np1), 
-    ('NP1011',np1),
-    ('NP1012',np1),
-    ('NP1013',np1),
-    
-    ('NP1015',np1),
-    ('NP1015',np1),
-    ('NP1016',np1),
-    ('NP1017',np1),
-       
-    ('NP1020',np1),
-    ('NP1021',np1),
-    ('NP1030',np1),
-    ('NP1031',np1),
-    
-    ('NP1022',np1),
-    ('NP1032',np1),
-    
-    ('NP1100',np1),
-    ('NP1110',np1100),
-    
-    ('PRB2_1_4_0480_1',np2),
-    ('PRB2_1_2_0640_0',np2),
-    ('NP2000',np2),
-    ('NP2003',np2),
-    ('NP2004',np2),
-    
-    ('PRB2_4_2_0640_0',np2),
-    ('PRB2_4_4_0480_1',np2),
-    ('NP2010',np2),
-    ('NP2013',np2),
-    ('NP2014',np2),
-    
-    ('NP1120',np1),
-    ('NP1121',np1),
-    ('NP1122',np1),
-    ('NP1123',np1),
-    ('NP1300',np1),
-    
-    ('NP1200',np128ch),
-    ('NXT3000',np128ch)
-    ])
-    
-    # get probe part number; if absent, this is a 3A
-    if 'imDatPrb_pn' in meta:   
-        pn = meta['imDatPrb_pn']
-    else:
-        pn = '3A';
-
-
-    if pn in M:
-        muxTableStr = M[pn] + '\n'
-    else:
+    _, muxTable = _tablesFor(_resolvePn(meta))
+    if muxTable is None:
         print('unsupported probe part number\n')
-        muxTableStr = []
+        muxTable = ''
     
-    return muxTableStr
+    return muxTable
 
 
 # =========================================================
@@ -249,17 +268,13 @@ def getMuxTable(meta):
 #
 def imroMetaItems(meta):
         
-    # read in the imro table 
-    imroTbl = meta['imroTbl'].split(sep=')')
+    # read in the imro table
+    imroStr = meta['imroTbl']
     
-    # there is an entry in the map for each saved channel
-    # number of entries in map -- subtract 1 for header, one for trailing ')'
-    nEntry = len(imroTbl) - 2
-
-    # read header to get what type of imro this is
-    headEntry = imroTbl[0]
-    headEntry = headEntry[1:len(headEntry)]   #remove leading '('
-    headList = headEntry.split(sep=',')
+    # read header to get what type of imro this is; only the header
+    # is needed to classify the table
+    headEnd = imroStr.index(')')
+    headList = imroStr[1:headEnd].split(sep=',')
     currType = headList[0]
     
     if int(currType) > 50000:
@@ -272,31 +287,27 @@ def imroMetaItems(meta):
         imAnyChanFullBandStr = 'imAnyChanFullBand=true'
         
     elif currType == '0':
-        # parse first entry of the table for lf and apgain
-        currEntry = imroTbl[1]
-        currEntry = currEntry[1:len(currEntry)]   #remove leading '('
-        currList = currEntry.split(sep=' ')
+        # parse first entry of the table for lf and apgain; slice it
+        # out rather than splitting the whole table
+        firstEntry = imroStr[headEnd+2:imroStr.index(')', headEnd+1)]
+        currList = firstEntry.split(sep=' ')
         imChan0apGainStr = 'imChan0apGain=' + currList[3]
         imChan0lfGainStr = 'imChan0lfGain=' + currList[4]
                    
         imAnyChanFullBandStr = 'imAnyChanFullBand=false'
         if len(currList) == 6:  # indicates this is not a 3A imro table
-        #check for any full band
-            for i in range(nEntry):
-                # check for any channels where the AP filter was not used
-                currEntry = imroTbl[i+1]
-                currEntry = currEntry[1:len(currEntry)]
-                currList = currEntry.split(sep=' ')
-                if currList[5] == '0':
-                    imAnyChanFullBandStr = 'imAnyChanFullBand=true'
-                    break
+            # check for any channels where the AP filter was not used;
+            # the filter flag is the last field in each entry, so a
+            # full band channel ends with ' 0)'
+            if ' 0)' in imroStr:
+                imAnyChanFullBandStr = 'imAnyChanFullBand=true'
 
     elif currType == '1110':
         # ap and lf gain and filter option are in the header 
         imChan0apGainStr = 'imChan0apGain=' + headList[3]
         imChan0lfGainStr = 'imChan0lfGain=' + headList[4]
         imAnyChanFullBandStr = 'imAnyChanFullBand=false'
-        if headList[5] == 0:
+        if headList[5].strip() == '0':
             imAnyChanFullBandStr = 'imAnyChanFullBand=true'
    
     
@@ -308,35 +319,46 @@ def imroMetaItems(meta):
     return imChan0apGainStr, imChan0lfGainStr, imAnyChanFullBandStr
 
 
+# =========================================================
+# Parse the (a:b:c:d) entries of a map string into an (nEntry,4)
+# array of type dtype. The header entry is skipped. The delimiters in
+# the rest of the string are replaced with spaces and all entries are
+# converted in a single NumPy call.
+#
+_MAP_DELIMITERS = str.maketrans('():', '   ')
+
+def _parseMapEntries(mapStr, dtype=np.float64):
+    # parsed tables are cached by map string, since maps for the same
+    # probe and channel selection are identical across recordings;
+    # return a copy so callers can't alter the cached table
+    return _parseMapEntriesCached(mapStr, dtype).copy()
+
+
+@functools.lru_cache(maxsize=8)
+def _parseMapEntriesCached(mapStr, dtype):
+    entryStr = mapStr[mapStr.index(')')+1:]
+    entryStr = entryStr.translate(_MAP_DELIMITERS)
+    return np.fromstring(entryStr, dtype=dtype, sep=' ').reshape(-1,4)
+
+
 # =========================================================
 # Parse snsGeomMap for XY coordinates
 #
 def geomMapToGeom(meta):
 
     # read in the shank map   
-    geomMap = meta['snsGeomMap'].split(sep=')')
+    geomMap = meta['snsGeomMap']
     
     # there is an entry in the map for each saved channel
-    # number of entries in map -- subtract 1 for header, one for trailing ')'
-    nEntry = len(geomMap) - 2
-
-    shankInd = np.zeros((nEntry,))
-    xCoord = np.zeros((nEntry,))
-    yCoord = np.zeros((nEntry,))
-    connected = np.zeros((nEntry,))
-    
-    for i in range(nEntry):
-        # get parameter list from this entry, skipping first header entry
-        currEntry = geomMap[i+1]
-        currEntry = currEntry[1:len(currEntry)]
-        currList = currEntry.split(sep=':')
-        shankInd[i] = int(currList[0])
-        xCoord[i] = float(currList[1])
-        yCoord[i] = float(currList[2])
-        connected[i] = int(currList[3])
+    # each row is [shank index, x, y, connected]
+    entries = _parseMapEntries(geomMap)
+    shankInd = entries[:,0].astype(np.int32)
+    xCoord = entries[:,1]
+    yCoord = entries[:,2]
+    connected = entries[:,3].astype(np.int32)
 
     # parse header for number of shanks
-    currList = geomMap[0].split(',')
+    currList = geomMap[:geomMap.index(')')].split(',')
     nShank = int(currList[1]);
     shankPitch = float(currList[2]);
     shankWidth = float(currList[3]);
@@ -349,28 +371,27 @@ def geomMapToGeom(meta):
 #
 def snsGeom(meta, shankInd, xCoord, yCoord, use):
     # header
-    # get probe part number; if absent, this is a 3A
-    if 'imDatPrb_pn' in meta:   
-        pn = meta['imDatPrb_pn']
-    else:
-        pn = '3A';
-        
-    geomList = getGeomParams(meta)
-    # geomList =
-    # [nShank, shankWidth, shankPitch, even_xOff, odd_xOff, horizPitch, vertPitch, rowsPerShank, elecPerShank]
+    pn = _resolvePn(meta)
+    geomParams = getGeomParams(meta)
     
     snsGeomStr = '~snsGeomMap=(' + pn
-    snsGeomStr = snsGeomStr + ',{:d},{:g},{:g})'.format(geomList[0], geomList[2], geomList[1])
-    nEntry = shankInd.shape[0]
+    snsGeomStr = snsGeomStr + ',{:d},{:g},{:g})'.format(geomParams.nShank, geomParams.shankPitch, geomParams.shankWidth)
     
-    for i in range(0,nEntry):
-        snsGeomStr = snsGeomStr + '({:g}:{:g}:{:g}:{:g})'.format(shankInd[i], xCoord[i], yCoord[i], use[i])
-    
-    snsGeomStr = snsGeomStr + '\n'
+    # one (shank:x:y:use) entry per channel
+    entryFormat = '({:g}:{:g}:{:g}:{:g})'.format
+    snsGeomStr = snsGeomStr + ''.join(map(entryFormat, shankInd, xCoord, yCoord, use)) + '\n'
     
     return snsGeomStr
 
 
+# =========================================================
+# Return the x offset for each (integer) row index:
+# odd_xOff for odd rows, even_xOff for even rows
+#
+def _rowXOffset(rowInd, geomParams):
+    return np.where(rowInd & 1, geomParams.odd_xOff, geomParams.even_xOff)
+
+
 # =========================================================
 # Get XY coordinates from snsShankMap plus hard coded geom values
 #
@@ -379,86 +400,73 @@ def shankMapToGeom(meta):
     # SYNC entry in the snsChanMap)
     AP, LF, SY = ChannelCountsIM(meta)
 
-    shankMap = meta['snsShankMap'].split(sep=')')
-    
-    shankInd = np.zeros((AP,))
-    colInd = np.zeros((AP,))
-    rowInd = np.zeros((AP,))
-    connected = np.zeros((AP,))
-    xCoord = np.zeros((AP,))
-    yCoord = np.zeros((AP,))
-    
-    for i in range(AP):
-        # get parameter list from this entry, skipping first header entry
-        currEntry = shankMap[i+1]
-        currEntry = currEntry[1:len(currEntry)]
-        currList = currEntry.split(sep=':')
-        shankInd[i] = int(currList[0])
-        colInd[i] = int(currList[1])
-        rowInd[i] = int(currList[2])
-        connected[i] = int(currList[3])
+    # keep the first AP entries;
+    # each row is [shank index, column index, row index, connected]
+    entries = _parseMapEntries(meta['snsShankMap'], dtype=np.int32)[:AP]
+    shankInd, colInd, rowInd, connected = entries.T
    
-    geomList = getGeomParams(meta);
-    # geomList = 
-    # [nShank, shankWidth, shankPitch, even_xOff, odd_xOff, horizPitch, vertPitch, rowsPerShank, elecPerShank]
+    geomParams = getGeomParams(meta);
     
-    oddRows = np.bool_(rowInd%2);
-    evenRows = ~oddRows;
-    xCoord = colInd*float(geomList[5]);
-    xCoord[evenRows] = xCoord[evenRows] + geomList[3]
-    xCoord[oddRows] = xCoord[oddRows] + geomList[4]
-    yCoord = rowInd*float(geomList[6])
+    xCoord = colInd*float(geomParams.horizPitch) + _rowXOffset(rowInd, geomParams)
+    yCoord = rowInd*float(geomParams.vertPitch)
     
-    nShank = geomList[0]
-    shankWidth = geomList[1]
-    shankPitch = geomList[2]
+    nShank = geomParams.nShank
+    shankWidth = geomParams.shankWidth
+    shankPitch = geomParams.shankPitch
     
     return nShank, shankWidth, shankPitch, shankInd, xCoord, yCoord, connected
 
 
+# =========================================================
+# Get coordinates for saved channels from snsGeomMap, if present,
+# otherwise from snsShankMap. Cached by meta file path and
+# modification time.
+#
+@functools.lru_cache(maxsize=64)
+def _savedCoords(metaPathStr, mtime):
+    meta = _readMetaCached(metaPathStr, mtime)
+    if 'snsGeomMap' in meta:
+        return geomMapToGeom(meta)
+    else:
+        return shankMapToGeom(meta)
+
+
 # =========================================================
 # Plot x z positions of all electrodes and saved channels
 #
 def plotSaved(xCoord, yCoord, shankInd, meta):
     
-    geomList = getGeomParams(meta)
-    # geomList = 
-    # [nShank, shankWidth, shankPitch, even_xOff, odd_xOff, horizPitch, vertPitch, rowsPerShank, elecPerShank]
+    # imported here so batch runs without plots don't pay for it
+    import matplotlib.pyplot as plt
     
-    # calculate positions on one shank
-    nCol = geomList[8]/geomList[7]
-    rowInd = np.arange(geomList[8])
-    rowInd = np.floor(rowInd/nCol)
-    oddRows = np.bool_(rowInd%2);
-    evenRows = ~oddRows;
+    geomParams = getGeomParams(meta)
     
-    colInd = np.arange(geomList[8])
-    colInd = (colInd % nCol)
+    # calculate positions on one shank
+    nCol = geomParams.elecPerShank/geomParams.rowsPerShank
+    elecInd = np.arange(geomParams.elecPerShank)
+    rowInd = np.floor(elecInd/nCol).astype(np.int64)
+    colInd = elecInd % nCol
     
-    xall = colInd*geomList[5]
-    xall[evenRows] = xall[evenRows] + geomList[3]
-    xall[oddRows] = xall[oddRows] + geomList[4]
+    xall = colInd*float(geomParams.horizPitch) + _rowXOffset(rowInd, geomParams)
     
-    yall = rowInd*geomList[6];
+    yall = rowInd*geomParams.vertPitch
     
     
     fig = plt.figure(figsize=(2,12))
     
-    shankSep = geomList[2]
+    shankSep = geomParams.shankPitch
+    nShank = geomParams.nShank
     
-    # loop over shanks
-    for sI in range(geomList[0]):
-        
-        # plot all positions   
-        marker_style = dict(c='w', edgecolor = 'k', linestyle='None', marker='s', s=5)                 
-        plt.scatter(shankSep*sI + xall, yall, **marker_style)
-        
-        # plot selected positions
-        currInd = np.argwhere(shankInd == sI)
-        marker_style = dict(c='b', edgecolor = 'g', linestyle='None', marker='s', s=15) 
-        plt.scatter(shankSep*sI + xCoord[currInd], yCoord[currInd], **marker_style)
+    # plot all positions on all shanks in one call
+    marker_style = dict(c='w', edgecolor = 'k', linestyle='None', marker='s', s=5)
+    xAllShanks = (shankSep*np.arange(nShank))[:,None] + xall[None,:]
+    plt.scatter(xAllShanks.ravel(), np.tile(yall, nShank), **marker_style)
+    
+    # plot selected positions on all shanks in one call
+    marker_style = dict(c='b', edgecolor = 'g', linestyle='None', marker='s', s=15) 
+    plt.scatter(shankSep*shankInd + xCoord, yCoord, **marker_style)
    
-   # after looping over all shanks, show plot 
+    # show plot 
     plt.show()
 
     return
@@ -472,41 +480,39 @@ def CoordsToText(meta, chans, xCoord, yCoord, connected, shankInd, shankSep, bas
 
     if buildPath:
         newName = baseName + '_siteCoords.txt'
-        saveFullPath = Path(savePath / newName)
+        saveFullPath = os.path.join(savePath, newName)
     else:
         saveFullPath = savePath
 
     # Note that the channel index written is the index of that channel in the saved file
 
-    with open(saveFullPath, 'w') as outFile:
-        for i in range(0,chans.size):
-            currX = shankInd[i]*shankSep + xCoord[i]
-            currLine = '{:d}\t{:g}\t{:g}\t{:g}\n'.format(i, currX, yCoord[i], shankInd[i])
-            outFile.write(currLine)
+    currX = shankInd*shankSep + xCoord
+    coords = np.column_stack((np.arange(chans.size), currX, yCoord, shankInd))
+    # savetxt writes one row at a time; a 1 MiB buffer holds the whole
+    # file, so it reaches the disk in a single write
+    with open(saveFullPath, 'w', buffering=1<<20) as outFile:
+        np.savetxt(outFile, coords, fmt=['%d','%g','%g','%g'], delimiter='\t')
 
 
 def CoordsToNPY(meta, chans, xCoord, yCoord, connected, shankInd, shankSep, baseName, savePath, buildPath ):
 
     if buildPath:
         newName = baseName + '_siteCoords.npy'
-        saveFullPath = Path(savePath / newName)
+        saveFullPath = os.path.join(savePath, newName)
     else:
         saveFullPath = savePath
 
-    # write an npy file of nChanx2 
-    nchan = xCoord.shape[0]
-    geom = np.zeros((nchan,2))
-    geom[:,0] = xCoord + shankInd*shankSep
-    geom[:,1] = yCoord
+    # write an npy file of nChanx2; float32 holds the um coordinates exactly
+    geom = np.column_stack((xCoord + shankInd*shankSep, yCoord)).astype(np.float32)
     
-    np.save(saveFullPath, geom)
+    np.save(saveFullPath, geom, allow_pickle=False)
 
             
 def CoordsToJRCString(meta, chans, xCoord, yCoord, connected, shankInd, shankSep, baseName, savePath, buildPath ):
     
     if buildPath:
         newName = baseName +'_forJRCprm.txt'
-        saveFullPath = Path(savePath / newName)
+        saveFullPath = os.path.join(savePath, newName)
     else:
         saveFullPath = savePath
     
@@ -518,53 +524,44 @@ def CoordsToJRCString(meta, chans, xCoord, yCoord, connected, shankInd, shankSep
     
     shankInd = shankInd + 1 # conver to 1-based for MATLAB
  
-    shankStr = 'shankMap = ['
-    coordStr = 'siteLoc = ['
-    siteMapStr = 'siteMap = ['
-    
     xCoord = shankInd*shankSep + xCoord
     
-    for i in range(0,chans.size-1):
-        shankStr = shankStr + '{:g},'.format(shankInd[i])   # convert to 1-based for MATLAB
-        coordStr = coordStr + '{:g},{:g};'.format(xCoord[i], yCoord[i])
-        siteMapStr = siteMapStr + '{:d},'.format(siteMap[i])    # convert to 1-based for MATLAB
-    
-    # final entries
-    shankStr = shankStr + '{:g}];\n'.format(shankInd[nChan-1])
-    coordStr = coordStr + '{:g},{:g}];\n'.format(xCoord[nChan-1], yCoord[nChan-1])
-    siteMapStr = siteMapStr + '{:d}];\n'.format(siteMap[nChan-1])
+    # format all entries and join once, rather than growing the strings per channel
+    shankStr = 'shankMap = [' + ','.join(map('{:g}'.format, shankInd)) + '];\n'
+    coordStr = 'siteLoc = [' + ';'.join(map('{:g},{:g}'.format, xCoord, yCoord)) + '];\n'
+    siteMapStr = 'siteMap = [' + ','.join(map('{:d}'.format, siteMap)) + '];\n'
     
-    with open(saveFullPath, 'w') as outFile:
-        outFile.write(shankStr) 
-        outFile.write(coordStr)
-        outFile.write(siteMapStr)
+    with open(saveFullPath, 'w', buffering=1<<20) as outFile:
+        outFile.write(shankStr + coordStr + siteMapStr)
 
 
 def CoordsToKSChanMap(meta, chans, xCoord, yCoord, connected, shankInd, shankSep, baseName, savePath, buildPath ): 
     
+    import scipy.io
+    
     if buildPath:
         newName = baseName +'_kilosortChanMap.mat'
-        saveFullPath = Path(savePath / newName)
+        saveFullPath = os.path.join(savePath, newName)
     else:
         saveFullPath = savePath
     
     nChan = chans.size
+    # fill one (nChan,5) buffer and save column views of it
     # channel map is the order of channels in the file, rather than the 
     # original indicies of the channels
-    chanMap0ind = np.arange(0,nChan,dtype='float64')
-    chanMap0ind = chanMap0ind.reshape((nChan,1))
-    chanMap = chanMap0ind + 1
-    
-    connected = (connected==1)
-    connected = connected.reshape((nChan,1))
-    
-    xCoord = shankInd*shankSep + xCoord
-    xCoord = xCoord.reshape((nChan,1))
-    yCoord = yCoord.reshape((nChan,1))
-    
-    kcoords = shankInd + 1
-    kcoords = kcoords.reshape((nChan,1))
-    kcoords = kcoords.astype('float64')
+    buf = np.empty((nChan,5), dtype='float64')
+    buf[:,0] = np.arange(0,nChan)
+    buf[:,1] = buf[:,0] + 1
+    buf[:,2] = shankInd*shankSep + xCoord
+    buf[:,3] = yCoord
+    buf[:,4] = shankInd + 1
+    chanMap0ind = buf[:,0:1]
+    chanMap = buf[:,1:2]
+    xCoord = buf[:,2:3]
+    yCoord = buf[:,3:4]
+    kcoords = buf[:,4:5]
+    
+    connected = (connected==1).reshape((nChan,1))
     
     name = baseName
     
@@ -577,57 +574,71 @@ def CoordsToKSChanMap(meta, chans, xCoord, yCoord, connected, shankInd, shankSep
             'ycoords':yCoord,
             'kcoords':kcoords,
             }
-    scipy.io.savemat(saveFullPath, mdict)
+    scipy.io.savemat(saveFullPath, mdict, do_compression=True, oned_as='column')
 
     
 def CoordsToGeomMap(meta, chans, xCoord, yCoord, connected, shankInd, shankSep, baseName, savePath, buildPath ):
 
     if buildPath:
         newName = baseName + '_orig.meta'
-        copyFullPath = Path(savePath / newName)
+        copyFullPath = os.path.join(savePath, newName)
     else:
         print('Can only make new metadata in same directory as original.')
         return
     
-    origPath = Path(savePath / (baseName + '.meta'))
-    shutil.move(origPath, copyFullPath)
-    shutil.copy(copyFullPath,origPath)
+    origPath = os.path.join(savePath, baseName + '.meta')
+    # keep a copy of the original, with its timestamps, then append to origPath
+    shutil.copy2(origPath, copyFullPath)
     
     # check 'new' fields; add if not present, add everything (most common case)
     if 'imChan0apGain' not in meta:        
         imChan0apGainStr, imChan0lfGainStr, imAnyChanFullBandStr = imroMetaItems(meta)
-        muxTableStr = getMuxTable(meta)        
+        muxTable = getMuxTable(meta)        
         snsGeomStr = snsGeom(meta, shankInd, xCoord, yCoord, connected)
     
+        # text mode, so the new lines get the platform line endings
+        # like the rest of the file
         with open(origPath, 'a') as outFile:
-            outFile.write(imChan0apGainStr)
-            outFile.write(imChan0lfGainStr)
-            outFile.write(imAnyChanFullBandStr)
-            outFile.write(muxTableStr)
-            outFile.write(snsGeomStr)
+            outFile.write(imChan0apGainStr + imChan0lfGainStr + imAnyChanFullBandStr
+                          + muxTable + snsGeomStr)
             
 
 
+# output writers, indexed by outType
+_WRITERS = (
+        CoordsToText,
+        CoordsToKSChanMap,
+        CoordsToJRCString,
+        CoordsToGeomMap,
+        CoordsToNPY
+)
+
+
 # =========================================================
 # Given a path to a SpikeGLX metadata file, write out coordinates
 # in formats for analysis software to consume
 # Input params:
 #   metaFullPath: full path, including the file name
-#   outType:  format for the output
+#   outType:  format for the output; < 0 for no output file
 #   badChan:  channels other than reference channels to exclude
 #   destFullPath: 
 #  
 def MetaToCoords(metaFullPath, outType, badChan= np.zeros((0), dtype = 'int'), destFullPath = '', showPlot=False):
        
-    # Read in metadata; returns a dictionary with string for values
-    meta = readMeta(metaFullPath)
+    if outType >= len(_WRITERS):
+        raise ValueError('unsupported outType {}; use 0-{:d}, or < 0 for no output'.format(outType, len(_WRITERS)-1))
     
-    # Get coordinates for saved channels from snsGeomMap, if present,
-    # otherwise from snsShankMap
-    if 'snsGeomMap' in meta:
-        [nShank, shankWidth, shankPitch, shankInd, xCoord, yCoord, connected] = geomMapToGeom(meta);
-    else:   
-        [nShank, shankWidth, shankPitch, shankInd, xCoord, yCoord, connected] = shankMapToGeom(meta);
+    # Read in metadata; returns a dictionary with string for values.
+    # Stat the file once so the metadata and coordinates below come
+    # from the same version of the file
+    metaKey = (str(metaFullPath), metaFullPath.stat().st_mtime_ns)
+    meta = dict(_readMetaCached(*metaKey))
+    
+    # Get coordinates for saved channels; cached per file and modification
+    # time, so copy the arrays before modifying them below
+    coords = _savedCoords(*metaKey)
+    [nShank, shankWidth, shankPitch, shankInd, xCoord, yCoord, connected] = \
+        [np.copy(c) if isinstance(c, np.ndarray) else c for c in coords]
     
     if showPlot:
         plotSaved(xCoord, yCoord, shankInd, meta)
@@ -652,20 +663,31 @@ def MetaToCoords(metaFullPath, outType, badChan= np.zeros((0), dtype = 'int'), d
         else:
             buildPath = False
             savePath = destFullPath
-        outputSwitch = {
-                0: CoordsToText,
-                1: CoordsToKSChanMap,
-                2: CoordsToJRCString,
-                3: CoordsToGeomMap,
-                4: CoordsToNPY
-        }
-        
-        writeFunc = outputSwitch.get(outType)
+        writeFunc = _WRITERS[outType]
         writeFunc(meta, chans, xCoord, yCoord, connected, shankInd, shankPitch, baseName, savePath, buildPath )
     
     return xCoord, yCoord, shankInd, connected, NchanTOT
 
 
+# =========================================================
+# Run MetaToCoords on a list of metadata files in parallel worker
+# processes. No plots are made. Returns a list of the MetaToCoords
+# outputs in the same order as metaFullPaths.
+# Input params:
+#   metaFullPaths: list of full paths, including the file names
+#   outType:  format for the output
+#   workers:  number of worker processes; None uses all cores
+#
+def MetaToCoordsMany(metaFullPaths, outType, workers=None):
+    
+    # imported here so single file use doesn't load multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    import itertools
+    
+    with ProcessPoolExecutor(workers) as ex:
+        return list(ex.map(MetaToCoords, metaFullPaths, itertools.repeat(outType)))
+
+
 # =========================================================    
 # Sample calling program to get a metadata file from the user,
 # output a file set by outType
@@ -678,6 +700,9 @@ def MetaToCoords(metaFullPath, outType, badChan= np.zeros((0), dtype = 'int'), d
 #
 def main():
     
+    from tkinter import Tk
+    from tkinter import filedialog
+    
     outType = 1
     
     # Get file from user